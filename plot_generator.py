@@ -5,14 +5,63 @@ This module contains shared functions for generating various types of Plotly plo
 used in the non-optimized and optimized rendering examples.
 """
 
-import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
+from plotly.colors import qualitative
+import plotly.io as pio
 import numpy as np
+import contextlib
+import copy
+import functools
 import os
 
-# Set random seed for reproducibility
-np.random.seed(42)
+try:
+    import orjson  # noqa: F401
+except ImportError:
+    orjson = None
+
+try:
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+# Serialize figures with orjson when available (much faster than the
+# default PlotlyJSONEncoder, and handles numpy arrays natively)
+if orjson is not None:
+    pio.json.config.default_engine = "orjson"
+
+# Seeded random generator for reproducibility
+rng = np.random.default_rng(42)
+
+# Pool of standard normal samples shared by all plots, see _noise()
+_NOISE = rng.standard_normal(200_000, dtype=np.float32)
+_NOISE.flags.writeable = False
+
+# Marker settings shared by all scatter traces (only the color varies)
+_SCATTER_MARKER_BASE = {
+    "size": 2,  # Smaller points for more traces
+    "colorscale": "Viridis",
+    "showscale": False,
+}
+
+# Category labels, fixed across figures
+_BAR_CATEGORIES = tuple(f"Cat_{j:03d}" for j in range(50))  # 50 categories
+_BOX_CATEGORIES = tuple(f"Group_{j}" for j in range(20))  # 20 categories
+_PIE_LABELS = tuple(f"Slice_{j:02d}" for j in range(25))  # 25 slices
+_VIOLIN_CATEGORIES = ("A", "B", "C", "D", "E")  # 5 categories
+_FUNNEL_STAGES = tuple(f"Stage_{j:02d}" for j in range(15))  # 15 stages
+
+# numpy dtypes to plotly.js typed array dtype codes (the types plotly.js
+# can decode, same table as plotly.py's own encoder)
+_TYPED_ARRAY_DTYPES = {
+    "int8": "i1",
+    "uint8": "u1",
+    "int16": "i2",
+    "uint16": "u2",
+    "int32": "i4",
+    "uint32": "u4",
+    "float32": "f4",
+    "float64": "f8",
+}
 
 # Different plot types to cycle through
 PLOT_TYPES = [
@@ -41,18 +90,46 @@ def get_plot_count() -> int:
     return int(os.getenv("PLOT_COUNT", "4"))
 
 
-def generate_plot(plot_type: str, index: int) -> go.Figure:
+def _base_layout(plot_type: str) -> dict:
     """
-    Generate a single Plotly plot with substantial data for performance testing.
+    Get the layout dict a figure of the given plot type starts from.
+
+    The layout only depends on the plot type and the default template, so it
+    is cached per plot type and template name. The returned dict is shared:
+    callers must copy it before modifying it.
+
+    Because the key is the template name, editing a registered template in
+    place (e.g. pio.templates["plotly"].layout.colorway = ...) is not picked
+    up by figures of plot types already generated; call
+    _build_base_layout.cache_clear() after such an edit.
 
     Args:
         plot_type: Type of plot to generate
-        index: Plot index for variation
 
     Returns:
-        Plotly figure object with subplots and large datasets
+        Layout dict including the default template (and the 2x2 subplot
+        axes and titles for scatter, line and bar plots)
+    """
+    template = pio.templates.default
+    if isinstance(template, str) or template is None:
+        return _build_base_layout(plot_type, template)
+    # Template objects are mutable and unhashable, build those uncached
+    return _build_base_layout.__wrapped__(plot_type, template)
+
+
+@functools.lru_cache(maxsize=len(PLOT_TYPES))
+def _build_base_layout(plot_type: str, template) -> dict:
+    """
+    Build the layout dict for a plot type, see _base_layout().
+
+    Args:
+        plot_type: Type of plot to generate
+        template: The default template the figure picks up on construction,
+            only used as the cache key
+
+    Returns:
+        Layout dict
     """
-    # Create subplot layout based on plot type
     if plot_type in ["scatter", "line", "bar"]:
         # 2x2 subplot grid for these types
         from plotly.subplots import make_subplots
@@ -68,221 +145,413 @@ def generate_plot(plot_type: str, index: int) -> go.Figure:
         # Single plot for other types
         fig = go.Figure()
 
+    return fig.layout.to_plotly_json()
+
+
+def _subplot_axes(subplot_idx: int) -> dict:
+    """
+    Get the axis references of a cell in the 2x2 subplot grid.
+
+    Args:
+        subplot_idx: Cell index in row-major order (0-3)
+
+    Returns:
+        Dict with the xaxis/yaxis keys to merge into a trace dict
+    """
+    suffix = str(subplot_idx + 1) if subplot_idx else ""
+    return {"xaxis": f"x{suffix}", "yaxis": f"y{suffix}"}
+
+
+def _typed_array(values: np.ndarray) -> dict | np.ndarray:
+    """
+    Encode a numpy array as a plotly.js typed array spec.
+
+    Plotly.js decodes the base64 buffer directly, which is much cheaper to
+    produce and to parse than a JSON list of numbers. This is the same spec
+    plotly.py's internal to_typed_array_spec builds, without its narwhals
+    dispatch and read-only copy of every array, and encoded with pybase64
+    when available.
+
+    Args:
+        values: Numeric numpy array
+
+    Returns:
+        Typed array spec dict with dtype, bdata (and shape for 2D arrays), or
+        the array unchanged if plotly.js has no typed array for its dtype
+    """
+    values = np.ascontiguousarray(values)
+    if values.dtype.name not in _TYPED_ARRAY_DTYPES:
+        return values
+    spec = {
+        "dtype": _TYPED_ARRAY_DTYPES[values.dtype.name],
+        "bdata": b64encode(values).decode("ascii"),
+    }
+    if values.ndim > 1:
+        spec["shape"] = ", ".join(str(n) for n in values.shape)
+    return spec
+
+
+def _category_traces(trace_type: str, categories: tuple, samples: np.ndarray) -> list:
+    """
+    Build one box or violin trace per category.
+
+    Matches the look of the single long-form trace plotly express would build
+    (one color, no legend, violins scaled together) without going through a
+    DataFrame.
+
+    Args:
+        trace_type: "box" or "violin"
+        categories: Category names, one per row of samples
+        samples: 2D array of samples, one row per category
+
+    Returns:
+        List of trace dicts
+    """
+    # Same color choice as plotly express: the template's first colorway
+    # color, or the D3 palette when the template has no colorway
+    template = _base_layout(trace_type).get("template", {})
+    colorway = template.get("layout", {}).get("colorway") or qualitative.D3
+    traces = [
+        {
+            "type": trace_type,
+            "y": _typed_array(row),
+            "name": cat,
+            "marker": {"color": colorway[0]},
+            "showlegend": False,
+        }
+        for cat, row in zip(categories, samples)
+    ]
+    if trace_type == "violin":
+        # Scale all violins to the same width, like a single px.violin trace
+        for trace in traces:
+            trace["scalegroup"] = "violin"
+    return traces
+
+
+def _category_axes() -> dict:
+    """
+    Get the axis titles of the box and violin plots.
+
+    Returns:
+        Dict with the xaxis/yaxis keys to merge into a layout dict
+    """
+    return {
+        "xaxis": {"title": {"text": "category"}},
+        "yaxis": {"title": {"text": "value"}},
+    }
+
+
+def _noise(n: int, shape: tuple = None) -> np.ndarray:
+    """
+    Take n consecutive standard normal samples from the shared noise pool.
+
+    The pool is drawn once at import time and each call reads it from a random
+    offset, so different figures (and repeated figures of the same type) get
+    different, possibly overlapping, slices of it. That is fine for demo data
+    and replaces the normal draws in generate_plot with a single integer draw.
+    The returned array is a read-only view into the pool.
+
+    Args:
+        n: Number of samples, at most the pool size
+        shape: Optional shape to reshape the samples to
+
+    Returns:
+        Float32 array of samples
+    """
+    start = rng.integers(_NOISE.size - n + 1)
+    samples = _NOISE[start : start + n]
+    return samples.reshape(shape) if shape else samples
+
+
+def generate_plot(plot_type: str, index: int) -> dict:
+    """
+    Generate a single Plotly plot with substantial data for performance testing.
+
+    The figure is built as a plain dict so that Plotly's property validators
+    never run over the large data arrays. Its layout template is shared with
+    other figures and must not be modified in place.
+
+    Args:
+        plot_type: Type of plot to generate
+        index: Plot index for variation
+
+    Returns:
+        Plotly figure dict with subplots and large datasets
+    """
+    # Copy the cached layout so the returned figure can be modified freely;
+    # only the (large, read-only) template dict is shared between figures
+    layout = {
+        key: value if key == "template" else copy.deepcopy(value)
+        for key, value in _base_layout(plot_type).items()
+    }
+    data = []
+
     if plot_type == "scatter":
         # Generate large datasets with scattergl for WebGL acceleration
-        for i in range(50):
-            # 1000 points per trace (50,000 total points)
-            n_points = 1000
-            x = np.random.randn(n_points) + (i % 10) * 2  # 10 different x positions
-            y = np.random.randn(n_points) + (i // 10) * 2  # 5 different y positions
-            colors = np.random.randn(n_points)
-
+        # 50 traces of 1000 points each (50,000 total points), drawn in bulk
+        # as float32 since WebGL uploads single precision anyway
+        n_traces, n_points = 50, 1000
+        shape = (n_traces, n_points)
+        trace_idx = np.arange(n_traces, dtype=np.float32)
+        # 10 different x positions, 5 different y positions
+        X = _noise(n_traces * n_points, shape) + ((trace_idx % 10) * 2)[:, None]
+        Y = _noise(n_traces * n_points, shape) + ((trace_idx // 10) * 2)[:, None]
+        C = _noise(n_traces * n_points, shape)
+
+        for i in range(n_traces):
             # Distribute across 4 subplots (roughly 12-13 traces per subplot)
-            subplot_idx = i % 4
-            row, col = (subplot_idx // 2) + 1, (subplot_idx % 2) + 1
-
-            fig.add_trace(
-                go.Scattergl(
-                    x=x,
-                    y=y,
-                    mode="markers",
-                    marker=dict(
-                        size=2,  # Smaller points for more traces
-                        color=colors,
-                        colorscale="Viridis",
-                        showscale=False
-                    ),
-                    name=f"Dataset {i + 1}",
-                    showlegend=False,  # Too many legends would be messy
-                ),
-                row=row,
-                col=col,
+            data.append(
+                {
+                    "type": "scattergl",
+                    "x": _typed_array(X[i]),
+                    "y": _typed_array(Y[i]),
+                    "mode": "markers",
+                    "marker": _SCATTER_MARKER_BASE | {"color": _typed_array(C[i])},
+                    "name": f"Dataset {i + 1}",
+                    "showlegend": False,  # Too many legends would be messy
+                    **_subplot_axes(i % 4),
+                }
             )
 
-        fig.update_layout(
-            title=f"Plot {index + 1}: Scatter Plots (50 traces, 50,000 points total)",
+        layout.update(
+            title={
+                "text": f"Plot {index + 1}: Scatter Plots "
+                "(50 traces, 50,000 points total)"
+            },
             showlegend=False,
         )
 
     elif plot_type == "line":
-        # Multiple high-density line plots
-        for i in range(4):
-            x = np.linspace(0, 10, 2000)  # 2000 points per line
-            y = np.sin(x + i * np.pi / 4) * np.exp(-x / 10) + 0.1 * np.random.randn(
-                2000
-            )
+        # Multiple high-density line plots: phase-shifted damped sines
+        x = np.linspace(0, 10, 2000)  # 2000 points per line
+        phases = np.arange(4) * (np.pi / 4)
 
-            row, col = (i // 2) + 1, (i % 2) + 1
-            fig.add_trace(
-                go.Scatter(
-                    x=x, y=y, mode="lines", name=f"Signal {i + 1}", line=dict(width=1.5)
-                ),
-                row=row,
-                col=col,
+        # sin(x + phase) * exp(-x / 10) + noise, one row per phase, in place
+        y_data = np.add(x, phases[:, None])
+        np.sin(y_data, out=y_data)
+        y_data *= np.exp(-x / 10)
+        y_data += 0.1 * _noise(4 * x.size, (4, x.size))
+
+        x = _typed_array(x)
+        for i, y in enumerate(y_data):
+            data.append(
+                {
+                    "type": "scatter",
+                    "x": x,
+                    "y": _typed_array(y),
+                    "mode": "lines",
+                    "name": f"Signal {i + 1}",
+                    "line": {"width": 1.5},
+                    **_subplot_axes(i),
+                }
             )
 
-        fig.update_layout(
-            title=f"Plot {index + 1}: Line Charts (8,000 points total)",
+        layout.update(
+            title={"text": f"Plot {index + 1}: Line Charts (8,000 points total)"},
         )
 
     elif plot_type == "bar":
         # Multiple bar charts with many categories
-        categories = [f"Cat_{j:03d}" for j in range(50)]  # 50 categories
+        # Different distributions, shifted in place per group
+        values = rng.exponential(10, (4, 50))
+        values += (np.arange(4) * 5)[:, None]
 
         for i in range(4):
-            values = np.random.exponential(10, 50) + i * 5  # Different distributions
-
-            row, col = (i // 2) + 1, (i % 2) + 1
-            fig.add_trace(
-                go.Bar(x=categories, y=values, name=f"Group {i + 1}"), row=row, col=col
+            data.append(
+                {
+                    "type": "bar",
+                    "x": _BAR_CATEGORIES,
+                    "y": values[i],
+                    "name": f"Group {i + 1}",
+                    **_subplot_axes(i),
+                }
             )
 
-        fig.update_layout(
-            title=f"Plot {index + 1}: Bar Charts (200 bars total)", showlegend=False
+        layout.update(
+            title={"text": f"Plot {index + 1}: Bar Charts (200 bars total)"},
+            showlegend=False,
         )
 
     elif plot_type == "histogram":
         # Multiple overlaid histograms with large datasets
         for i in range(3):
             # 2000 samples per distribution
-            data = np.random.normal(i, 1, 2000)
-            fig.add_trace(
-                go.Histogram(
-                    x=data, nbinsx=50, name=f"Distribution {i + 1}", opacity=0.7
-                )
+            samples = _noise(2000) + i
+            data.append(
+                {
+                    "type": "histogram",
+                    "x": samples,
+                    "nbinsx": 50,
+                    "name": f"Distribution {i + 1}",
+                    "opacity": 0.7,
+                }
             )
 
-        fig.update_layout(
-            title=f"Plot {index + 1}: Histogram (6,000 samples)", barmode="overlay"
+        layout.update(
+            title={"text": f"Plot {index + 1}: Histogram (6,000 samples)"},
+            barmode="overlay",
         )
 
     elif plot_type == "box":
         # Box plots with many categories and large samples
-        categories = [f"Group_{j}" for j in range(20)]  # 20 categories
-        all_data = []
-        all_categories = []
-
-        for cat in categories:
-            # 200 samples per category
-            data = np.random.normal(np.random.uniform(-2, 2), 1, 200)
-            all_data.extend(data)
-            all_categories.extend([cat] * len(data))
-
-        df = pd.DataFrame({"category": all_categories, "value": all_data})
-        fig = px.box(
-            df,
-            x="category",
-            y="value",
-            title=f"Plot {index + 1}: Box Plots (4,000 samples)",
+        categories = _BOX_CATEGORIES
+
+        # 200 samples per category, each around its own random mean
+        means = rng.uniform(-2, 2, len(categories))
+        samples = _noise(len(categories) * 200, (len(categories), 200))
+        samples = samples + means[:, None]
+
+        data.extend(_category_traces("box", categories, samples))
+        layout.update(
+            _category_axes(),
+            title={"text": f"Plot {index + 1}: Box Plots (4,000 samples)"},
         )
 
     elif plot_type == "heatmap":
         # Large heatmap
-        z = np.random.randn(100, 100)  # 100x100 matrix
-        fig.add_trace(go.Heatmap(z=z, colorscale="RdBu_r", showscale=True))
-        fig.update_layout(
-            title=f"Plot {index + 1}: Heatmap (10,000 cells)",
+        # 100x100 matrix, float32 is plenty at display resolution
+        z = _noise(100 * 100, (100, 100))
+        data.append(
+            {
+                "type": "heatmap",
+                "z": _typed_array(z),
+                "colorscale": "RdBu_r",
+                "showscale": True,
+            }
+        )
+        layout.update(
+            title={"text": f"Plot {index + 1}: Heatmap (10,000 cells)"},
         )
 
     elif plot_type == "pie":
         # Pie chart with many slices
-        labels = [f"Slice_{j:02d}" for j in range(25)]  # 25 slices
-        values = np.random.exponential(10, 25)
-        fig.add_trace(
-            go.Pie(
-                labels=labels,
-                values=values,
-                textinfo="none",  # Hide text for cleaner look
-                hoverinfo="label+percent",
-            )
+        values = rng.exponential(10, 25)
+        data.append(
+            {
+                "type": "pie",
+                "labels": _PIE_LABELS,
+                "values": values,
+                "textinfo": "none",  # Hide text for cleaner look
+                "hoverinfo": "label+percent",
+            }
         )
-        fig.update_layout(
-            title=f"Plot {index + 1}: Pie Chart (25 slices)",
+        layout.update(
+            title={"text": f"Plot {index + 1}: Pie Chart (25 slices)"},
         )
 
     elif plot_type == "violin":
         # Violin plots with large datasets
-        categories = ["A", "B", "C", "D", "E"]  # 5 categories
-        all_data = []
-        all_categories = []
-
-        for cat in categories:
-            # 1000 samples per category
-            data = np.random.normal(ord(cat) - ord("C"), 1, 1000)
-            all_data.extend(data)
-            all_categories.extend([cat] * len(data))
-
-        df = pd.DataFrame({"category": all_categories, "value": all_data})
-        fig = px.violin(
-            df,
-            y="value",
-            x="category",
-            title=f"Plot {index + 1}: Violin Plots (5,000 samples)",
+        categories = _VIOLIN_CATEGORIES
+
+        # 1000 samples per category, centered on -2..2
+        means = np.array([ord(cat) - ord("C") for cat in categories], dtype=np.float32)
+        samples = _noise(len(categories) * 1000, (len(categories), 1000))
+        samples = samples + means[:, None]
+
+        data.extend(_category_traces("violin", categories, samples))
+        layout.update(
+            _category_axes(),
+            title={"text": f"Plot {index + 1}: Violin Plots (5,000 samples)"},
         )
 
     elif plot_type == "area":
         # Stacked area chart with multiple series
-        x = np.linspace(0, 10, 500)
-        y_data = []
-        for i in range(5):
-            y = np.cumsum(np.random.randn(500)) + i * 10
-            y_data.append(y)
+        x = _typed_array(np.linspace(0, 10, 500))
+        # 5 random walks of 500 steps, offset by 10 per series
+        y_data = np.cumsum(_noise(5 * 500, (5, 500)), axis=1, dtype=np.float64)
+        y_data += (np.arange(5) * 10.0)[:, None]
 
         for i, y in enumerate(y_data):
-            fig.add_trace(
-                go.Scatter(
-                    x=x,
-                    y=y,
-                    mode="lines",
-                    fill="tonexty" if i > 0 else "tozeroy",
-                    name=f"Series {i + 1}",
-                )
+            data.append(
+                {
+                    "type": "scatter",
+                    "x": x,
+                    "y": _typed_array(y),
+                    "mode": "lines",
+                    "fill": "tonexty" if i > 0 else "tozeroy",
+                    "name": f"Series {i + 1}",
+                }
             )
 
-        fig.update_layout(
-            title=f"Plot {index + 1}: Area Chart (2,500 points)",
+        layout.update(
+            title={"text": f"Plot {index + 1}: Area Chart (2,500 points)"},
         )
 
     elif plot_type == "funnel":
         # Funnel chart with many stages
-        stages = [f"Stage_{j:02d}" for j in range(15)]  # 15 stages
-        values = np.sort(np.random.exponential(100, 15))[::-1]  # Decreasing values
-        fig.add_trace(go.Funnel(y=stages, x=values, textinfo="value+percent initial"))
-        fig.update_layout(
-            title=f"Plot {index + 1}: Funnel Chart (15 stages)", width=1000,
+        values = -np.sort(-rng.exponential(100, 15))  # Decreasing, contiguous
+        data.append(
+            {
+                "type": "funnel",
+                "y": _FUNNEL_STAGES,
+                "x": values,
+                "textinfo": "value+percent initial",
+            }
+        )
+        layout.update(
+            title={"text": f"Plot {index + 1}: Funnel Chart (15 stages)"},
+            width=1000,
         )
 
     else:
         raise ValueError(f"Unknown plot type: {plot_type}")
 
-    return fig
+    return {"data": data, "layout": layout}
 
 
-def generate_plots(num_plots: int = None, show_progress: bool = True) -> None:
+def generate_plots(
+    num_plots: int = None, show_progress: bool = True, html_path: str = None
+) -> None:
     """
     Generate and display multiple plots.
 
     Args:
         num_plots: Number of plots to generate (defaults to PLOT_COUNT env var, or 2)
         show_progress: Whether to show progress messages
+        html_path: If given, write all plots to this single HTML file instead of
+            displaying them (plotly.js is loaded once, from the CDN)
     """
     if num_plots is None:
         num_plots = get_plot_count()
 
-    for i in range(num_plots):
-        plot_type = PLOT_TYPES[i % len(PLOT_TYPES)]
-        fig = generate_plot(plot_type, i)
-
-        # Configure for theme-aware rendering
-        # Use transparent background so theme can control it
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-        )
-
-        # Show the plot
-        fig.show()
+    with (
+        open(html_path, "w", encoding="utf-8")
+        if html_path
+        else contextlib.nullcontext()
+    ) as html_file:
+        if html_file:
+            html_file.write('<html>\n<head><meta charset="utf-8" /></head>\n<body>\n')
+
+        for i in range(num_plots):
+            plot_type = PLOT_TYPES[i % len(PLOT_TYPES)]
+            fig = generate_plot(plot_type, i)
+
+            # Configure for theme-aware rendering
+            # Use transparent background so theme can control it
+            fig["layout"].update(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+            )
 
-        # Add spacing between plots
-        if show_progress and (i + 1) % 10 == 0:
-            print(f"\n--- {i + 1} plots generated ---\n")
+            if html_file:
+                # Append the plot div, only the first one loads plotly.js
+                html_file.write(
+                    pio.to_html(
+                        fig,
+                        include_plotlyjs="cdn" if i == 0 else False,
+                        full_html=False,
+                        validate=False,
+                    )
+                )
+            else:
+                # Show the plot. Passing our own dict with validate=False hands
+                # it to the renderers as-is, without the validation and
+                # deepcopy that go.Figure.to_dict() would do.
+                pio.show(fig, validate=False)
+
+            # Add spacing between plots
+            if show_progress and (i + 1) % 10 == 0:
+                print(f"\n--- {i + 1} plots generated ---\n")
+
+        if html_file:
+            html_file.write("</body>\n</html>\n")